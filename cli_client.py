@@ -5,79 +5,156 @@ Provides terminal-based interface for playing the game
 
 import asyncio
 import websockets
-import json
-import threading
+import orjson
+import os
+import shutil
 import sys
+import threading
 import argparse
-from typing import Optional
+from typing import List, Optional
+
+def _dumps(obj) -> str:
+    """Serialize a message with orjson for sending as a JSON text frame."""
+    return orjson.dumps(obj).decode()
+
+HELP_TEXT = "\n".join([
+    "",
+    "="*40,
+    "            HELP - HOW TO PLAY",
+    "="*40,
+    "Commands:",
+    "  move <row> <col> - Make a move (e.g., 'move 1 2')",
+    "  help            - Show this help message",
+    "  quit            - Quit the game",
+    "  reset           - Reset the game (if you're a player)",
+    "  board           - Show current board",
+    "",
+    "Board coordinates:",
+    "  Rows and columns are numbered 0, 1, 2",
+    "  Top-left is (0,0), bottom-right is (2,2)",
+    "",
+    "Example moves:",
+    "  move 0 0  - Place in top-left",
+    "  move 1 1  - Place in center",
+    "  move 2 2  - Place in bottom-right",
+    "="*40,
+    "",
+])
+
+# Board cells are kept as codes 0/1/2 for empty/X/O in a flat 9-byte bytearray
+_CELL_CODES = {"": 0, "X": 1, "O": 2}
+_SYMBOLS = (" ", "X", "O")
+# Rendered board row for every combination of three cell codes
+_ROW_TEXT = {
+    bytes((a, b, c)): "|".join(f" {_SYMBOLS[cell]} " for cell in (a, b, c))
+    for a in range(3) for b in range(3) for c in range(3)
+}
 
 class TicTacToeClient:
     def __init__(self, server_url: str):
         self.server_url = server_url
         self.websocket: Optional[websockets.WebSocketClientProtocol] = None
         self.player_id: Optional[str] = None
-        self.game_board = [["" for _ in range(3)] for _ in range(3)]
+        self.game_board = bytearray(9)
         self.game_status = "waiting"
         self.current_turn = None
+        self.winner = None
         self.player_count = 0
         self.connected = False
-        self.input_thread = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stdin_fd = sys.stdin.fileno()
+        self._stdin_buf = b""
+        self._stdin_polled = False  # Whether stdin is read by the event loop rather than a thread
+        self._out_q: Optional[asyncio.Queue] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        self._prev_frame: List[str] = []
         
-    def display_board(self):
-        """Display the current game board in ASCII format."""
-        print("\n" + "="*20)
-        print("   TIC-TAC-TOE")
-        print("="*20)
-        print("\nCurrent Board:")
-        print("   0   1   2")
-        for i, row in enumerate(self.game_board):
-            row_display = f"{i}  "
-            for j, cell in enumerate(row):
-                display_cell = cell if cell else " "
-                row_display += f" {display_cell} "
-                if j < 2:
-                    row_display += "|"
-            print(row_display)
+    def _board_frame(self) -> List[str]:
+        """Build the board display as a fixed-height list of lines."""
+        frame = ["", "="*20, "   TIC-TAC-TOE", "="*20, "", "Current Board:", "   0   1   2"]
+        board = bytes(self.game_board)
+        for i in range(3):
+            frame.append(f"{i}  " + _ROW_TEXT[board[3 * i:3 * i + 3]])
             if i < 2:
-                print("  -----------")
+                frame.append("  -----------")
         
-        print(f"\nGame Status: {self.game_status}")
-        if self.current_turn:
-            print(f"Current Turn: {self.current_turn}")
-        print(f"Players Connected: {self.player_count}/2")
-        
-        if self.player_id:
-            print(f"You are: {self.player_id}")
+        # Optional lines are kept as blanks so every frame has the same height
+        frame.append("")
+        frame.append(f"Game Status: {self.game_status}")
+        frame.append(f"Current Turn: {self.current_turn}" if self.current_turn else "")
+        frame.append(f"Players Connected: {self.player_count}/2")
+        frame.append(f"You are: {self.player_id}" if self.player_id else "")
+        frame.append("")
         
         if self.game_status == "in_progress":
             if self.current_turn == self.player_id:
-                print("\n🎮 It's your turn! Enter your move.")
+                frame.append("🎮 It's your turn! Enter your move.")
             else:
-                print(f"\n⏳ Waiting for {self.current_turn}'s move...")
+                frame.append(f"⏳ Waiting for {self.current_turn}'s move...")
         elif self.game_status == "waiting":
-            print("\n⏳ Waiting for another player to join...")
+            frame.append("⏳ Waiting for another player to join...")
+        elif self.game_status == "finished":
+            if self.winner is None:
+                frame.append("🤝 Game Over! It's a draw!")
+            elif self.winner == self.player_id:
+                frame.append("🏆 Game Over! Congratulations, you won!")
+            else:
+                frame.append(f"🎉 Game Over! Winner: {self.winner}")
+        else:
+            frame.append("")
+        
+        frame.append("")
+        frame.append("="*20)
+        return frame
+    
+    def display_board(self, force: bool = False):
+        """Display the current game board in ASCII format.
         
-        print("\n" + "="*20)
+        On a terminal tall enough, the board is pinned above a scrolling region
+        and only the lines that changed since the last frame are redrawn.
+        """
+        frame = self._board_frame()
+        
+        rows = shutil.get_terminal_size().lines if sys.stdout.isatty() else 0
+        if rows <= len(frame):
+            # No room to pin the board above a scrolling region; print it whole
+            self._restore_terminal()
+            frame.append("")
+            sys.stdout.write("\n".join(frame))
+            sys.stdout.flush()
+            return
+        
+        out = []
+        if force or not self._prev_frame:
+            # Clear the screen and keep everything below the board scrolling
+            out.append(f"\x1b[2J\x1b[{len(frame) + 1};{rows}r\x1b[{rows};1H")
+            self._prev_frame = []
+        
+        prev = self._prev_frame
+        changed = [i for i, line in enumerate(frame) if i >= len(prev) or prev[i] != line]
+        if not changed:
+            return
+        
+        out.append("\x1b7")
+        for i in changed:
+            out.append(f"\x1b[{i + 1};1H\x1b[2K{frame[i]}")
+        out.append("\x1b8")
+        
+        sys.stdout.write("".join(out))
+        sys.stdout.flush()
+        self._prev_frame = frame
+    
+    def _restore_terminal(self):
+        """Release the scrolling region set up by display_board."""
+        if self._prev_frame:
+            sys.stdout.write("\x1b[r")
+            sys.stdout.flush()
+            self._prev_frame = []
     
     def display_help(self):
         """Display help information."""
-        print("\n" + "="*40)
-        print("            HELP - HOW TO PLAY")
-        print("="*40)
-        print("Commands:")
-        print("  move <row> <col> - Make a move (e.g., 'move 1 2')")
-        print("  help            - Show this help message")
-        print("  quit            - Quit the game")
-        print("  reset           - Reset the game (if you're a player)")
-        print("  board           - Show current board")
-        print("\nBoard coordinates:")
-        print("  Rows and columns are numbered 0, 1, 2")
-        print("  Top-left is (0,0), bottom-right is (2,2)")
-        print("\nExample moves:")
-        print("  move 0 0  - Place in top-left")
-        print("  move 1 1  - Place in center")
-        print("  move 2 2  - Place in bottom-right")
-        print("="*40)
+        sys.stdout.write(HELP_TEXT)
+        sys.stdout.flush()
     
     async def connect(self):
         """Connect to the WebSocket server."""
@@ -92,7 +169,7 @@ class TicTacToeClient:
             print("✅ Connected successfully!")
             
             # Join the game
-            await self.send_message({"type": "join"})
+            self.send_message({"type": "join"})
             
         except Exception as e:
             print(f"❌ Failed to connect: {e}")
@@ -107,13 +184,25 @@ class TicTacToeClient:
             await self.websocket.close()
             print("Disconnected from server.")
     
-    async def send_message(self, message: dict):
-        print (f"🔄 Sending message: {message}")
-
-        """Send a message to the server."""
-        if self.websocket and self.connected:
+    def send_message(self, message: dict):
+        """Queue a message for the writer task to send to the server."""
+        if self._out_q is not None:
+            self._out_q.put_nowait(message)
+    
+    async def _writer(self):
+        """Send queued messages, coalescing everything pending into a single frame."""
+        while self.connected:
+            batch = [await self._out_q.get()]
+            while True:
+                try:
+                    batch.append(self._out_q.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+            
+            # A lone message goes out as-is; several go out as one JSON array
+            payload = batch[0] if len(batch) == 1 else batch
             try:
-                await self.websocket.send(json.dumps(message))
+                await self.websocket.send(_dumps(payload))
             except Exception as e:
                 print(f"❌ Failed to send message: {e}")
                 self.connected = False
@@ -121,7 +210,7 @@ class TicTacToeClient:
     async def handle_server_message(self, message: str):
         """Handle incoming message from server."""
         try:
-            data = json.loads(message)
+            data = orjson.loads(message)
             message_type = data.get('type')
             
             if message_type == 'joined':
@@ -130,9 +219,13 @@ class TicTacToeClient:
                 self.display_board()
                 
             elif message_type == 'update':
-                self.game_board = data.get('board', self.game_board)
+                board = data.get('board')
+                if board:
+                    # The wire format stays a 3x3 list; convert once on arrival
+                    self.game_board = bytearray(_CELL_CODES.get(cell, 0) for row in board for cell in row)
                 self.current_turn = data.get('nextTurn')
                 self.game_status = data.get('status', 'waiting')
+                self.winner = data.get('winner')
                 self.player_count = data.get('playerCount', 0)
                 self.display_board()
                 
@@ -156,7 +249,7 @@ class TicTacToeClient:
             else:
                 print(f"📨 Server message: {data}")
                 
-        except json.JSONDecodeError:
+        except orjson.JSONDecodeError:
             print(f"❌ Invalid message from server: {message}")
         except Exception as e:
             print(f"❌ Error handling server message: {e}")
@@ -173,92 +266,147 @@ class TicTacToeClient:
             print(f"❌ Error listening for messages: {e}")
             self.connected = False
     
-    def handle_user_input(self):
-        """Handle user input in a separate thread."""
-        self.display_help()
-        print("\nType 'help' for commands or 'quit' to exit.")
+    def handle_user_input(self, user_input: str):
+        """Handle a single line of user input."""
+        user_input = user_input.strip().lower()
         
-        while self.connected:
-            try:
-                user_input = input("\n> ").strip().lower()
-                
-                if not user_input:
-                    continue
-                
-                if user_input == 'quit':
-                    print("Goodbye! 👋")
-                    self.connected = False
-                    break
-                
-                elif user_input == 'help':
-                    self.display_help()
-                
-                elif user_input == 'board':
-                    self.display_board()
-                
-                elif user_input == 'reset':
-                    if self.player_id:
-                        asyncio.run_coroutine_threadsafe(self.send_message({"type": "reset"}), self.loop)
-                        print("🔄 Reset request sent...")
-                    else:
-                        print("❌ You must join the game first!")
-                
-                elif user_input.startswith('move '):
-                    # Parse move command
-                    print ("🔄 Processing move command...")
+        if not user_input:
+            return
+        
+        if user_input == 'quit':
+            print("Goodbye! 👋")
+            self.quit()
+        
+        elif user_input == 'help':
+            self.display_help()
+        
+        elif user_input == 'board':
+            self.display_board(force=True)
+        
+        elif user_input == 'reset':
+            if self.player_id:
+                self.send_message({"type": "reset"})
+                print("🔄 Reset request sent...")
+            else:
+                print("❌ You must join the game first!")
+        
+        elif user_input.startswith('move '):
+            # Parse move command
+            print ("🔄 Processing move command...")
 
-                    parts = user_input.split()
-                    if len(parts) == 3:
-                        try:
-                            row = int(parts[1])
-                            col = int(parts[2])
-                            
-                            if 0 <= row <= 2 and 0 <= col <= 2:
-                                message = {
-                                    "type": "move",
-                                    "row": row,
-                                    "col": col
-                                }
-                                asyncio.run_coroutine_threadsafe(self.send_message(message), self.loop)
-                                print(f"🎯 Move sent: ({row}, {col})")
-                            else:
-                                print("❌ Invalid coordinates! Use 0-2 for row and column.")
-                        except ValueError:
-                            print("❌ Invalid move format! Use: move <row> <col>")
-                    else:
-                        print("❌ Invalid move format! Use: move <row> <col>")
-                
-                else:
-                    print("❌ Unknown command. Type 'help' for available commands.")
+            parts = user_input.split()
+            if len(parts) == 3:
+                try:
+                    row = int(parts[1])
+                    col = int(parts[2])
                     
-            except (EOFError, KeyboardInterrupt):
-                print("\nGoodbye! 👋")
-                self.connected = False
-                break
+                    if 0 <= row <= 2 and 0 <= col <= 2:
+                        message = {
+                            "type": "move",
+                            "row": row,
+                            "col": col
+                        }
+                        self.send_message(message)
+                        print(f"🎯 Move sent: ({row}, {col})")
+                    else:
+                        print("❌ Invalid coordinates! Use 0-2 for row and column.")
+                except ValueError:
+                    print("❌ Invalid move format! Use: move <row> <col>")
+            else:
+                print("❌ Invalid move format! Use: move <row> <col>")
+        
+        else:
+            print("❌ Unknown command. Type 'help' for available commands.")
+    
+    def _start_input(self):
+        """Read user input from the event loop itself, or from a thread where stdin can't be polled."""
+        try:
+            self.loop.add_reader(self._stdin_fd, self._on_stdin)
+            self._stdin_polled = True
+        except (NotImplementedError, PermissionError):
+            # Files and /dev/null can't be polled, and Windows' Proactor
+            # loop has no add_reader() at all
+            threading.Thread(target=self._read_input_lines, daemon=True).start()
+    
+    def _stop_input(self):
+        """Stop reading user input from the event loop."""
+        if self._stdin_polled:
+            self.loop.remove_reader(self._stdin_fd)
+            self._stdin_polled = False
+    
+    def _on_stdin(self):
+        """Read whatever stdin has ready and handle each complete line."""
+        data = os.read(self._stdin_fd, 4096)
+        if not data:
+            self._on_input_eof()
+            return
+        
+        self._stdin_buf += data
+        *lines, self._stdin_buf = self._stdin_buf.split(b"\n")
+        self._handle_input_lines([line.decode(errors='replace') for line in lines])
+    
+    def _read_input_lines(self):
+        """Read user input a line at a time in a thread, handing each line to the event loop."""
+        try:
+            while self.connected:
+                line = sys.stdin.readline()
+                if not line:
+                    self.loop.call_soon_threadsafe(self._on_input_eof)
+                    return
+                self.loop.call_soon_threadsafe(self._handle_input_lines, [line])
+        except RuntimeError:
+            pass  # The event loop has already closed
+    
+    def _handle_input_lines(self, lines: List[str]):
+        """Handle complete lines of user input, then prompt for the next one."""
+        for line in lines:
+            if not self.connected:
+                return
+            try:
+                self.handle_user_input(line)
             except Exception as e:
                 print(f"❌ Error handling input: {e}")
+        
+        if self.connected:
+            print("\n> ", end="", flush=True)
+    
+    def _on_input_eof(self):
+        """Treat the end of input like a quit command."""
+        if self.connected:
+            print("\nGoodbye! 👋")
+            self.quit()
+    
+    def quit(self):
+        """Stop reading input and close the connection so run() can finish."""
+        self.connected = False
+        self._stop_input()
+        if self.websocket:
+            asyncio.create_task(self.websocket.close())
     
     async def run(self):
         """Main client run loop."""
+        # Bind everything loop-specific to the loop asyncio.run() started
+        self.loop = asyncio.get_running_loop()
+        self._out_q = asyncio.Queue()
         if not await self.connect():
             return
         
-        self.loop = asyncio.get_running_loop()
-
-        # Start input handling in a separate thread
-        self.input_thread = threading.Thread(target=self.handle_user_input)
-        self.input_thread.daemon = True
-        self.input_thread.start()
-        
-        # Listen for server messages
-        await self.listen_for_messages()
-        
-        # Clean up
+        self._writer_task = asyncio.create_task(self._writer())
+        try:
+            # Read user input from the event loop itself instead of a thread
+            self.display_help()
+            print("\nType 'help' for commands or 'quit' to exit.")
+            print("\n> ", end="", flush=True)
+            self._start_input()
+            
+            # Listen for server messages
+            await self.listen_for_messages()
+        finally:
+            # Clean up, leaving the terminal usable even after Ctrl-C or an error
+            self._stop_input()
+            self._writer_task.cancel()
+            self._restore_terminal()
         await self.disconnect()
-        
-        # Wait for input thread to finish
-        if self.input_thread and self.input_thread.is_alive():
-            self.input_thread.join(timeout=1)
 
 def main():
     """Main function to run the client."""
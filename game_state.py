@@ -3,38 +3,82 @@ Game State Manager for Tic-Tac-Toe
 Handles game logic, validation, and win detection
 """
 
+import logging
+import msgpack
 from typing import List, Optional, Tuple, Dict
 from enum import Enum
 
-class GameStatus(Enum):
+logger = logging.getLogger(__name__)
+
+class GameStatus(str, Enum):
     WAITING = "waiting"
     IN_PROGRESS = "in_progress"
     FINISHED = "finished"
 
-class Player(Enum):
+class Player(str, Enum):
     X = "X"
     O = "O"
 
 class GameState:
+    # Winning lines as 9-bit masks, cell (row, col) maps to bit row*3+col
+    WIN_MASKS = (
+        0b111000000, 0b000111000, 0b000000111,  # rows
+        0b100100100, 0b010010010, 0b001001001,  # columns
+        0b100010001, 0b001010100,               # diagonals
+    )
+    FULL_MASK = 0x1FF
+    # Every one of the 512 possible player bitmasks that contains a winning line
+    WINNING_BITS = frozenset(bits for mask in WIN_MASKS for bits in range(512) if (bits & mask) == mask)
+    
+    # (X row bits, O row bits) -> that row's cells, used to rebuild the board
+    ROW_CELLS = {
+        (x, o): tuple("X" if x >> i & 1 else "O" if o >> i & 1 else "" for i in range(3))
+        for x in range(8) for o in range(8) if not x & o
+    }
+    
+    # Cell (row, col) -> its bit; any other key is an out-of-range move
+    CELL_BITS = {(r, c): 1 << (r * 3 + c) for r in range(3) for c in range(3)}
+    
+    # Move rejection checks, keyed by (status, player in game, player's turn)
+    MOVE_ERRORS = (
+        None,
+        "Game is not in progress",
+        "Player not in game",
+        "Not your turn. Current turn: {turn}",
+    )
+    MOVE_CHECKS = {
+        (status, in_game, is_turn): (
+            1 if status != GameStatus.IN_PROGRESS else 2 if not in_game else 3 if not is_turn else 0
+        )
+        for status in GameStatus for in_game in (False, True) for is_turn in (False, True)
+    }
+
     def __init__(self):
-        self.board: List[List[str]] = [["" for _ in range(3)] for _ in range(3)]
+        self.x_bits: int = 0
+        self.o_bits: int = 0
         self.current_turn: Player = Player.X
         self.status: GameStatus = GameStatus.WAITING
         self.winner: Optional[Player] = None
         self.players: Dict[str, Player] = {}  # player_id -> Player
-        self.player_count: int = 0
         self.board_size: int = 3  # Tic-Tac-Toe is always 3x3
+        self.version: int = 0  # bumped on every state change
+        self._state_payload: Optional[bytes] = None  # cached get_state_payload() result
+    
+    def _touch(self):
+        """Record a state change: bump the version and drop the cached payload."""
+        self.version += 1
+        self._state_payload = None
     
     def add_player(self, player_id: str) -> Optional[Player]:
-        print(f"🔄 Adding player {player_id} to the game")
-        
         """Add a player to the game. Returns assigned player symbol or None if game is full."""
+        logger.debug("Adding player %s to the game", player_id)
+        
         if player_id in self.players:
-            print(f"Player {player_id} is already in the game")
+            logger.debug("Player %s is already in the game", player_id)
             return self.players[player_id]           # already joined
 
         if self.player_count >= 2:
-            print(f"Game is full. Player {player_id} cannot join")
+            logger.debug("Game is full. Player %s cannot join", player_id)
             return None
         
         if self.player_count == 0:
@@ -43,7 +87,7 @@ class GameState:
             assigned_player = Player.O
             
         self.players[player_id] = assigned_player
-        self.player_count += 1
+        self._touch()
         
         if self.player_count == 2:
             self.status = GameStatus.IN_PROGRESS
@@ -54,7 +98,7 @@ class GameState:
         """Remove a player from the game."""
         if player_id in self.players:
             del self.players[player_id]
-            self.player_count -= 1
+            self._touch()
             if self.player_count < 2:
                 self.status = GameStatus.WAITING
     
@@ -62,35 +106,34 @@ class GameState:
         """
         Attempt to make a move. Returns (success, message).
         """
-        print(f"Player {player_id} attempting to make move at ({row}, {col})")
+        logger.debug("Player %s attempting to make move at (%s, %s)", player_id, row, col)
 
-        # Validate game state
-        if self.status != GameStatus.IN_PROGRESS:
-            return False, "Game is not in progress"
-        
-        # Validate player
-        if player_id not in self.players:
-            return False, "Player not in game"
-        
-        player = self.players[player_id]
-        
-        # Check if it's player's turn
-        if player != self.current_turn:
-            return False, f"Not your turn. Current turn: {self.current_turn.value}"
+        # Validate game state, player and turn with a single table lookup
+        player = self.players.get(player_id)
+        code = self.MOVE_CHECKS[(self.status, player is not None, player is self.current_turn)]
+        if code:
+            return False, self.MOVE_ERRORS[code].format(turn=self.current_turn.value)
         
         # Validate move coordinates
-        if not (0 <= row <= 2 and 0 <= col <= 2):
+        bit = self.CELL_BITS.get((row, col))
+        if bit is None:
             return False, "Invalid coordinates. Use 0-2 for row and column"
         
         # Check if cell is empty
-        if self.board[row][col] != "":
+        if bit & (self.x_bits | self.o_bits):
             return False, "Cell is already occupied"
         
         # Make the move
-        self.board[row][col] = player.value
+        self._touch()
+        if player == Player.X:
+            self.x_bits |= bit
+            bits = self.x_bits
+        else:
+            self.o_bits |= bit
+            bits = self.o_bits
         
         # Check for win or draw
-        if self._check_win():
+        if self._check_win(bits):
             self.winner = player
             self.status = GameStatus.FINISHED
         elif self._is_board_full():
@@ -99,58 +142,54 @@ class GameState:
         else:
             # Switch turns and explicitly set the next player
             self.current_turn = Player.O if player == Player.X else Player.X
-            print(f"🎮 Switched turn to: {self.current_turn.value}")
+            logger.debug("Switched turn to: %s", self.current_turn.value)
     
-        print(f"✅ Move successful by {player.value} at ({row}, {col})")
+        logger.debug("Move successful by %s at (%s, %s)", player.value, row, col)
         return True, "Move successful"
     
-    def _check_win(self) -> bool:
-        """Check if there's a winner."""
-        board = self.board
-        
-        # Check rows
-        for row in board:
-            if row[0] == row[1] == row[2] != "":
-                return True
-        
-        # Check columns
-        for col in range(self.board_size):
-            if board[0][col] == board[1][col] == board[2][col] != "":
-                return True
-        
-        # Check diagonals
-        if board[0][0] == board[1][1] == board[2][2] != "":
-            return True
-        if board[0][2] == board[1][1] == board[2][0] != "":
-            return True
-        
-        return False
+    def _check_win(self, bits: int) -> bool:
+        """Check if the given player bitmask completes a winning line."""
+        return bits in self.WINNING_BITS
     
     def _is_board_full(self) -> bool:
         """Check if the board is full."""
-        for row in self.board:
-            for cell in row:
-                if cell == "":
-                    return False
-        return True
+        return (self.x_bits | self.o_bits) == self.FULL_MASK
+    
+    @property
+    def player_count(self) -> int:
+        """Number of players in the game."""
+        return len(self.players)
+    
+    @property
+    def board(self) -> List[List[str]]:
+        """Board as a 3x3 list of "X"/"O"/"" cells, rebuilt from the bitmasks."""
+        x_bits, o_bits = self.x_bits, self.o_bits
+        return [list(self.ROW_CELLS[(x_bits >> r & 7, o_bits >> r & 7)]) for r in (0, 3, 6)]
     
     def get_state_dict(self) -> dict:
         """Get the current game state as a dictionary."""
         return {
             "board": self.board,
-            "current_turn": self.current_turn.value if self.current_turn else None,
-            "status": self.status.value,
-            "winner": self.winner.value if self.winner else None,
+            "current_turn": self.current_turn,
+            "status": self.status,
+            "winner": self.winner,
             "player_count": self.player_count,
-            "players": {pid: player.value for pid, player in self.players.items()}
+            "players": dict(self.players)
         }
     
+    def get_state_payload(self) -> bytes:
+        """Get the current game state packed with MessagePack, cached until the state changes."""
+        if self._state_payload is None:
+            self._state_payload = msgpack.packb(self.get_state_dict(), use_bin_type=True)
+        return self._state_payload
+    
     def reset(self):
-        print ("🔄 Resetting game state to initial values")
-
         """Reset the game state to initial values."""
+        logger.debug("Resetting game state to initial values")
+        
         # Reset game board
-        self.board = [["" for _ in range(3)] for _ in range(3)]
+        self.x_bits = 0
+        self.o_bits = 0
         
         # Reset game status
         self.status = GameStatus.WAITING
@@ -159,24 +198,25 @@ class GameState:
         
         # Reset players
         self.players.clear()
-        self.player_count = 0
+        self._touch()
     
     def load_state(self, saved_state: dict):
         """Load game state from saved data"""
-        print(f"📥 Loading state: {saved_state}")
+        logger.debug("Loading state: %s", saved_state)
         
-        # Load board state
-        self.board = saved_state.get('board', [["" for _ in range(3)] for _ in range(3)])
+        self._touch()
         
-        # Clear existing players first
-        self.players.clear()
-        self.player_count = 0
+        # Load board state
+        self.x_bits = 0
+        self.o_bits = 0
+        for i, cell in enumerate(c for row in saved_state.get('board', []) for c in row):
+            if cell == Player.X:
+                self.x_bits |= 1 << i
+            elif cell == Player.O:
+                self.o_bits |= 1 << i
         
-        # Load players first to ensure correct count
-        if saved_state.get('players'):
-            for player_id, symbol in saved_state.get('players').items():
-                self.players[player_id] = Player(symbol)
-                self.player_count += 1
+        # Load players
+        self.players = {player_id: Player(symbol) for player_id, symbol in (saved_state.get('players') or {}).items()}
         
         # Load game status
         self.status = GameStatus(saved_state.get('status', 'waiting'))
@@ -191,5 +231,5 @@ class GameState:
         # Load winner if exists
         self.winner = Player(saved_state['winner']) if saved_state.get('winner') else None
         
-        print(f"📊 Loaded state - Players: {self.players}, Count: {self.player_count}")
-        print(f"🎮 Current turn: {self.current_turn.value}, Status: {self.status.value}")
\ No newline at end of file
+        logger.debug("Loaded state - Players: %s, Count: %s", self.players, self.player_count)
+        logger.debug("Current turn: %s, Status: %s", self.current_turn.value, self.status.value)
\ No newline at end of file
@@ -3,106 +3,367 @@ Redis Synchronization Layer for Server Communication
 Handles pub/sub messaging between servers
 """
 
+import asyncio
+import time
+from collections import deque
 import redis
-import json
-import threading
-from typing import Callable, Dict
+import redis.asyncio
+import msgpack
+from typing import Awaitable, Callable, Dict, Optional, Tuple, Union
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Most pub/sub messages drained into one batch before dispatching it
+MAX_DRAIN = 100
+# Seconds to wait for the echo of our own publish before giving up on it
+ECHO_TIMEOUT = 5.0
+
+# Connection pools shared by every manager talking to the same Redis server
+_POOLS: Dict[Tuple[str, int], redis.asyncio.ConnectionPool] = {}
+
+def _get_pool(host: str, port: int) -> redis.asyncio.ConnectionPool:
+    """Get the shared connection pool for a Redis server, creating it on first use."""
+    pool = _POOLS.get((host, port))
+    if pool is None:
+        pool = _POOLS[(host, port)] = redis.asyncio.ConnectionPool(
+            host=host,
+            port=port,
+            max_connections=32,
+            socket_keepalive=True,
+            health_check_interval=30
+        )
+    return pool
+
+def _pack(obj) -> bytes:
+    """Serialize a message or state for Redis."""
+    return msgpack.packb(obj, use_bin_type=True)
+
+def _unpack(data: bytes):
+    """Deserialize a message or state read from Redis."""
+    return msgpack.unpackb(data, raw=False)
+
 class RedisSyncManager:
     def __init__(self, redis_host: str = 'localhost', redis_port: int = 6379):
-        self.redis_client = redis.Redis(host=redis_host, port=redis_port, decode_responses=True)
+        self.redis_client = redis.asyncio.Redis(connection_pool=_get_pool(redis_host, redis_port))
         self.pubsub = self.redis_client.pubsub()
-        self.message_handlers: Dict[str, Callable] = {}
+        self.message_handlers: Dict[str, Callable[[dict], Awaitable[None]]] = {}
         self.listening = False
-        self.listener_thread = None
+        self.listener_task: Optional[asyncio.Task] = None
+        
+        # Last state write, used to skip repeating it while nothing else has changed
+        self._last_state: Optional[Tuple[str, bytes]] = None  # (state key, payload)
+        # Last queued write, so an exact repeat is dropped while nothing else has changed
+        self._last_queued: Optional[Tuple[str, Optional[str], bytes]] = None  # (game id, channel, payload or state)
+        # Our publishes whose echo has not come back yet, oldest first. Redis
+        # delivers in publish order, so anything from others arriving before
+        # those echoes was published before our write and is already stale.
+        self._pending_echoes: deque = deque()  # (payload, monotonic publish time)
+        # Called to reload the state from Redis when echoes never came back,
+        # since messages from others were dropped while waiting for them
+        self.resync_handler: Optional[Callable[[], Awaitable[None]]] = None
         
-        # Test connection
+        # Queued state writes and publishes, written in the background by _write_queued()
+        self._writes: Optional[asyncio.Queue] = None
+        self.writer_task: Optional[asyncio.Task] = None
+    
+    async def connect(self):
+        """Test the Redis connection."""
         try:
-            self.redis_client.ping()
+            await self.redis_client.ping()
             logger.info("Connected to Redis successfully")
         except redis.ConnectionError:
             logger.error("Failed to connect to Redis")
             raise
     
-    def subscribe_to_channel(self, channel: str, handler: Callable[[dict], None]):
-        """Subscribe to a Redis channel with a message handler."""
+    async def subscribe_to_channel(self, channel: str, handler: Callable[[dict], Awaitable[None]]):
+        """Subscribe to a Redis channel with an async message handler."""
         self.message_handlers[channel] = handler
-        self.pubsub.subscribe(channel)
+        await self.pubsub.subscribe(channel)
         logger.info(f"Subscribed to channel: {channel}")
     
-    def publish_message(self, channel: str, message: dict):
-        """Publish a message to a Redis channel."""
-        try:
-            message_str = json.dumps(message)
-            self.redis_client.publish(channel, message_str)
-            logger.debug(f"Published to {channel}: {message}")
-        except Exception as e:
-            logger.error(f"Failed to publish message: {e}")
+    def _expect_echo(self, channel: str, payload: bytes) -> Optional[Tuple[bytes, float]]:
+        """Note a publish before sending it, so the listener can tell its echo apart.
+        
+        Must run before the publish is sent: the echo may otherwise be handled
+        before the publishing coroutine resumes. Returns the entry to pass to
+        _cancel_echoes() if the publish fails.
+        """
+        if not (self.listening and channel in self.message_handlers):
+            return None
+        entry = (payload, time.monotonic())
+        self._pending_echoes.append(entry)
+        return entry
+    
+    def _cancel_echoes(self, entries):
+        """Stop waiting for the echoes of publishes that failed."""
+        for entry in entries:
+            try:
+                self._pending_echoes.remove(entry)
+            except ValueError:
+                pass
     
     def start_listening(self):
-        """Start listening for messages in a separate thread."""
+        """Start listening for messages in a task on the running event loop."""
         if self.listening:
             return
         
         self.listening = True
-        self.listener_thread = threading.Thread(target=self._listen_for_messages)
-        self.listener_thread.daemon = True
-        self.listener_thread.start()
+        self.listener_task = asyncio.create_task(self._listen_for_messages())
         logger.info("Started Redis message listener")
     
-    def stop_listening(self):
+    async def stop_listening(self):
         """Stop listening for messages."""
         self.listening = False
-        if self.listener_thread:
-            self.listener_thread.join(timeout=1)
-        self.pubsub.close()
+        if self.listener_task:
+            try:
+                await asyncio.wait_for(self.listener_task, timeout=1)
+            except asyncio.TimeoutError:
+                pass  # wait_for() cancels the listener on timeout
+        await self.pubsub.aclose()
         logger.info("Stopped Redis message listener")
     
-    def _listen_for_messages(self):
-        """Internal method to listen for Redis pub/sub messages."""
+    async def _listen_for_messages(self):
+        """Internal coroutine to listen for Redis pub/sub messages."""
+        # Bind per-message lookups to locals once for the hot loop
+        handlers = self.message_handlers
+        get_message = self.pubsub.get_message
+        unpack = _unpack
+        pending_echoes = self._pending_echoes
+        
         try:
-            for message in self.pubsub.listen():
-                if not self.listening:
-                    break
+            # Poll with a short timeout so stop_listening() is noticed promptly
+            while self.listening:
+                message = await get_message(timeout=0.1)
+                
+                # Forget echoes that never came (e.g. lost across a reconnect)
+                resync = False
+                if pending_echoes:
+                    expired = time.monotonic() - ECHO_TIMEOUT
+                    while pending_echoes and pending_echoes[0][1] < expired:
+                        pending_echoes.popleft()
+                        resync = True
                 
-                if message['type'] == 'message':
-                    channel = message['channel']
-                    data = message['data']
+                if not message:
+                    if resync:
+                        await self._resync()
+                    continue
+                
+                # Drain whatever else has already arrived, keeping only the
+                # latest message per channel and sender (ordered by arrival);
+                # each one carries the full state, so earlier ones are stale
+                latest: Dict[Tuple[str, object], Tuple[str, dict]] = {}
+                for _ in range(MAX_DRAIN):
+                    if message['type'] == 'message':
+                        channel = message['channel'].decode()
+                        data = message['data']
+                        
+                        stale = False
+                        if pending_echoes and data == pending_echoes[0][0]:
+                            pending_echoes.popleft()
+                        else:
+                            # Another server wrote, so repeats of our last write must go out again
+                            self._last_queued = None
+                            stale = bool(pending_echoes)
+                        
+                        if stale:
+                            logger.debug(f"Dropped message from {channel} published before our own")
+                        else:
+                            try:
+                                parsed_data = unpack(data)
+                                if not isinstance(parsed_data, dict):
+                                    logger.error(f"Ignored non-map message from {channel}: {data}")
+                                else:
+                                    key = (channel, parsed_data.get('server_id'))
+                                    latest.pop(key, None)
+                                    latest[key] = (channel, parsed_data)
+                            except ValueError:
+                                logger.error(f"Failed to parse message from {channel}: {data}")
+                            except Exception as e:
+                                logger.error(f"Error reading message from {channel}: {e}")
                     
+                    message = await get_message(timeout=0)
+                    if not message:
+                        break
+                
+                for channel, parsed_data in latest.values():
                     try:
-                        parsed_data = json.loads(data)
-                        if channel in self.message_handlers:
-                            self.message_handlers[channel](parsed_data)
-                    except json.JSONDecodeError:
-                        logger.error(f"Failed to parse message from {channel}: {data}")
+                        # States published with a message arrive still packed
+                        game_state = parsed_data.get('game_state')
+                        if isinstance(game_state, bytes):
+                            parsed_data['game_state'] = unpack(game_state)
+                        handler = handlers.get(channel)
+                        if handler is not None:
+                            await handler(parsed_data)
+                    except ValueError:
+                        logger.error(f"Failed to parse game state from {channel}")
                     except Exception as e:
                         logger.error(f"Error handling message from {channel}: {e}")
+                
+                if resync:
+                    await self._resync()
         except Exception as e:
             logger.error(f"Error in Redis listener: {e}")
     
-    def get_game_state(self, game_id: str = "default") -> dict:
-        """Get the current game state from Redis."""
+    async def _resync(self):
+        """Hand over to resync_handler after dropping messages for echoes that never came."""
+        logger.warning("Own publishes were not echoed back; resyncing from Redis")
+        if self.resync_handler is None:
+            return
+        try:
+            await self.resync_handler()
+        except Exception as e:
+            logger.error(f"Failed to resync from Redis: {e}")
+    
+    async def get_game_state(self, game_id: str = "default") -> dict:
+        """Get the current game state from Redis, after any queued writes have landed."""
+        await self.flush()
         state_key = f"game_state:{game_id}"
-        state_str = self.redis_client.get(state_key)
+        state_data = await self.redis_client.get(state_key)
         
-        if state_str:
-            return json.loads(state_str)
+        if state_data:
+            return _unpack(state_data)
         return None
     
-    def set_game_state(self, state: dict, game_id: str = "default"):
-        """Store the current game state in Redis."""
+    async def set_game_state(self, state: Union[dict, bytes], game_id: str = "default"):
+        """Store the current game state in Redis. Accepts a dict or an already packed payload.
+        
+        Passing the very payload object stored last (as GameState's cached
+        payload is, until the state changes) skips the write.
+        """
         state_key = f"game_state:{game_id}"
-        state_str = json.dumps(state)
-        self.redis_client.set(state_key, state_str)
+        if self._last_state and self._last_state[0] == state_key and self._last_state[1] is state:
+            logger.debug(f"Skipped unchanged game state write: {game_id}")
+            return
+        state_data = state if isinstance(state, bytes) else _pack(state)
+        await self.redis_client.set(state_key, state_data)
+        self._last_state = (state_key, state_data)
+        self._last_queued = None
         logger.debug(f"Updated game state in Redis: {game_id}")
     
-    def clear_game_state(self, game_id: str = "default"):
+    def queue_save_and_publish(self, state: bytes, channel: Optional[str], message: Optional[dict],
+                               game_id: str = "default"):
+        """Queue storing a packed game state and publishing it with a message (fire-and-forget).
+        
+        The packed state is reused as-is for both the SET and the message's
+        game_state field, so it is never encoded twice. Queued writes are sent
+        in order by a background task, all writes that are ready going out in
+        a single pipeline. Failures are only logged. With no channel, only the
+        state is saved.
+        
+        The echo is expected from the moment of queueing: a peer's message
+        handled before our write goes out predates it and must not be
+        applied over the local change it is about to publish.
+        """
+        payload = echo = None
+        if channel is not None:
+            payload = _pack({**message, 'game_state': state})
+        
+        # An exact repeat changes nothing in Redis or for the other servers
+        last_queued = (game_id, channel, state if payload is None else payload)
+        if last_queued == self._last_queued:
+            logger.debug(f"Skipped duplicate queued write to {channel}")
+            return
+        self._last_queued = last_queued
+        
+        if self.writer_task is None:
+            self._writes = asyncio.Queue()
+            self.writer_task = asyncio.create_task(self._write_queued())
+        if channel is not None:
+            echo = self._expect_echo(channel, payload)
+        self._writes.put_nowait((state, channel, payload, echo, game_id))
+    
+    async def flush(self):
+        """Wait until every queued write has been sent to Redis."""
+        if self._writes is not None:
+            await self._writes.join()
+    
+    async def stop_writer(self):
+        """Flush queued writes and stop the background writer."""
+        if self.writer_task is None:
+            return
+        try:
+            await asyncio.wait_for(self.flush(), timeout=1)
+        except asyncio.TimeoutError:
+            logger.warning("Dropped queued Redis writes on shutdown")
+        self.writer_task.cancel()
+        self.writer_task = None
+    
+    async def _write_queued(self):
+        """Internal coroutine sending queued state writes and publishes."""
+        writes = self._writes
+        while True:
+            batch = [await writes.get()]
+            while True:
+                try:
+                    batch.append(writes.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+            
+            echoes = [echo for _, _, _, echo, _ in batch]
+            try:
+                async with self.redis_client.pipeline() as pipe:
+                    for state, channel, payload, _, game_id in batch:
+                        state_key = f"game_state:{game_id}"
+                        pipe.set(state_key, state)
+                        if channel is not None:
+                            pipe.publish(channel, payload)
+                    await pipe.execute()
+                self._last_state = (state_key, state)
+                logger.debug(f"Committed {len(batch)} queued state writes")
+            except Exception as e:
+                self._cancel_echoes(echoes)
+                self._last_queued = None
+                logger.error(f"Failed to write queued game state: {e}")
+            finally:
+                for _ in batch:
+                    writes.task_done()
+    
+    async def cas_save_and_publish(self, update: Callable[[Optional[dict]], Optional[Tuple[bytes, dict]]],
+                                   channel: str, game_id: str = "default") -> Optional[bytes]:
+        """Read-modify-write the game state and publish it, atomically (WATCH/MULTI/EXEC).
+        
+        update() gets the stored state (or None) and returns the new packed
+        state with the message to publish, or None to abort. It is called again
+        whenever another server writes the state in between. Returns the packed
+        state written, or None if update() aborted.
+        """
+        await self.flush()
+        state_key = f"game_state:{game_id}"
+        async with self.redis_client.pipeline() as pipe:
+            while True:
+                try:
+                    await pipe.watch(state_key)
+                    stored = await pipe.get(state_key)
+                    result = update(_unpack(stored) if stored else None)
+                    if result is None:
+                        return None
+                    
+                    state, message = result
+                    payload = _pack({**message, 'game_state': state})
+                    pipe.multi()
+                    pipe.set(state_key, state)
+                    pipe.publish(channel, payload)
+                    echo = self._expect_echo(channel, payload)
+                    try:
+                        await pipe.execute()
+                    except Exception:
+                        self._cancel_echoes([echo])
+                        raise
+                except redis.WatchError:
+                    logger.debug(f"Game state changed during update, retrying: {game_id}")
+                    continue
+                
+                self._last_state = (state_key, state)
+                self._last_queued = None
+                return state
+    
+    async def clear_game_state(self, game_id: str = "default"):
         """Clear the game state from Redis."""
         state_key = f"game_state:{game_id}"
-        self.redis_client.delete(state_key)
+        await self.redis_client.delete(state_key)
+        self._last_state = None
+        self._last_queued = None
         logger.info(f"Cleared game state: {game_id}")
 
 # Channel names for different types of messages
@@ -41,7 +41,7 @@ echo "📦 Installing Python dependencies..."
 if [ -f "requirements.txt" ]; then
     pip3 install -r requirements.txt
 else
-    pip3 install websockets==11.0.3 redis==5.0.1
+    pip3 install websockets==11.0.3 redis==5.0.1 msgpack==1.0.7 orjson==3.9.10 "uvloop==0.19.0; sys_platform != 'win32'"
 fi
 
 if [ $? -eq 0 ]; then
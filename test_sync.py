@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Cross-server sync tests: two servers sharing one (fake) Redis.
+
+Requires fakeredis (pip install fakeredis); run with: python -m unittest
+"""
+
+import asyncio
+import logging
+import time
+import unittest
+from unittest import mock
+
+import orjson
+import redis.asyncio.client
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+from game_state import Player
+from redis_sync import ECHO_TIMEOUT
+from websocket_server import TicTacToeServer
+
+LATENCY = 0.01  # Simulated Redis round-trip for pipelines, in seconds
+
+def setUpModule():
+    logging.disable(logging.CRITICAL)
+
+def tearDownModule():
+    logging.disable(logging.NOTSET)
+
+async def _settle():
+    """Give pub/sub messages time to reach the other server."""
+    await asyncio.sleep(0.3)
+
+@unittest.skipIf(fakeredis is None, "fakeredis is not installed")
+class TwoServerSyncTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        redis_server = fakeredis.FakeServer()
+        with mock.patch('redis.asyncio.Redis',
+                        lambda **kwargs: fakeredis.aioredis.FakeRedis(server=redis_server)):
+            self.a = TicTacToeServer('A', 0, force_reset=True)
+            self.b = TicTacToeServer('B', 0)
+        # websocket -> messages sent to it
+        self.sent = {}
+        for server in (self.a, self.b):
+            server.send_raw = lambda websocket, message_str: self.sent.setdefault(websocket, []).append(
+                orjson.loads(message_str))
+            server.send_error = self._record_error
+            await server.setup_redis()
+
+    async def asyncTearDown(self):
+        for server in (self.a, self.b):
+            await server.redis_sync.stop_writer()
+            await server.redis_sync.stop_listening()
+
+    async def _record_error(self, websocket, error_message):
+        self.sent.setdefault(websocket, []).append({'type': 'error', 'message': error_message})
+
+    async def assertConverged(self):
+        await _settle()
+        stored = await self.a.redis_sync.get_game_state()
+        self.assertEqual(self.a.game_state.get_state_dict(), self.b.game_state.get_state_dict())
+        self.assertEqual(self.a.game_state.board, stored['board'])
+        self.assertEqual(dict(self.a.game_state.players), stored['players'])
+        self.assertFalse(self.a.redis_sync._pending_echoes)
+        self.assertFalse(self.b.redis_sync._pending_echoes)
+
+    async def start_game(self):
+        """Join p1 on A as X and p2 on B as O."""
+        await self.a.handle_join('ws1', 'p1', {'type': 'join'})
+        await self.b.handle_join('ws2', 'p2', {'type': 'join'})
+        await _settle()
+
+    def with_latency(self):
+        """Delay every pipelined Redis command, as a networked Redis would."""
+        immediate = redis.asyncio.client.Pipeline.immediate_execute_command
+        execute = redis.asyncio.client.Pipeline.execute
+
+        async def slow_immediate(pipe, *args, **options):
+            await asyncio.sleep(LATENCY)
+            return await immediate(pipe, *args, **options)
+
+        async def slow_execute(pipe, *args, **kwargs):
+            await asyncio.sleep(LATENCY)
+            return await execute(pipe, *args, **kwargs)
+
+        return mock.patch.multiple(redis.asyncio.client.Pipeline,
+                                   immediate_execute_command=slow_immediate, execute=slow_execute)
+
+    async def test_concurrent_joins_hand_out_each_symbol_once(self):
+        await asyncio.gather(*(server.handle_join(f'ws{n}', f'p{n}', {'type': 'join'})
+                               for n, server in enumerate((self.a, self.b, self.a, self.b))))
+        joined = [message['playerId'] for messages in self.sent.values()
+                  for message in messages if message['type'] == 'joined']
+        self.assertCountEqual(joined, [Player.X.value, Player.O.value])
+        await self.assertConverged()
+
+    async def test_move_racing_a_join_on_the_same_server_is_kept(self):
+        await self.start_game()
+        async def move_while_join_reads_state():
+            await asyncio.sleep(LATENCY * 1.5)
+            await self.a.handle_move('ws1', 'p1', {'type': 'move', 'row': 1, 'col': 1})
+
+        with self.with_latency():
+            await asyncio.gather(self.a.handle_join('ws3', 'p3', {'type': 'join'}),
+                                 move_while_join_reads_state())
+        self.assertEqual(self.sent['ws3'][-1], {'type': 'error', 'message': 'Game is full'})
+        self.assertEqual(self.a.game_state.board[1][1], Player.X)
+        self.assertEqual(self.a.game_state.current_turn, Player.O)
+        await self.assertConverged()
+
+    async def test_leave_racing_a_join_on_another_server_keeps_the_join(self):
+        await self.b.handle_join('ws1', 'p1', {'type': 'join'})
+        await _settle()
+        self.b._departed.append('p1')
+        with self.with_latency():
+            await asyncio.gather(self.b._post_unregister_sync(),
+                                 self.a.handle_join('ws3', 'p3', {'type': 'join'}))
+        await self.assertConverged()
+        self.assertNotIn('p1', self.a.game_state.players)
+        self.assertIn('p3', self.a.game_state.players)
+
+    async def test_moves_on_both_servers_converge_at_every_interleaving(self):
+        for yields in range(12):
+            with self.subTest(yields=yields):
+                await self.a.handle_reset('ws1', 'p1', {'type': 'reset'})
+                await self.start_game()
+                move_b = asyncio.create_task(
+                    self.b.handle_move('ws1', 'p1', {'type': 'move', 'row': 0, 'col': 0}))
+                for _ in range(yields):
+                    await asyncio.sleep(0)
+                await self.a.handle_move('ws1', 'p1', {'type': 'move', 'row': 2, 'col': 2})
+                await move_b
+                await self.assertConverged()
+                self.assertEqual(sum(cell == Player.X for row in self.a.game_state.board for cell in row), 1)
+
+    async def test_lost_echo_triggers_resync(self):
+        # An echo about to expire: B's join arrives while A still waits for it
+        # and is dropped, so A only learns of the join from the resync
+        expires_soon = time.monotonic() - ECHO_TIMEOUT + 0.15
+        self.a.redis_sync._pending_echoes.append((b'never published', expires_soon))
+        await self.b.handle_join('ws1', 'p1', {'type': 'join'})
+        await _settle()
+        self.assertEqual(self.a.game_state.players, {'p1': Player.X})
+        await self.assertConverged()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,11 +5,12 @@ Handles client connections and game logic coordination
 
 import asyncio
 import websockets
-import json
+import orjson
 import logging
 import argparse
-import uuid
-from typing import Dict, Set
+import itertools
+import secrets
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
 from game_state import GameState, GameStatus, Player
 from redis_sync import RedisSyncManager, CHANNELS
 
@@ -17,54 +18,122 @@ from redis_sync import RedisSyncManager, CHANNELS
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Number of clients enqueued per event loop turn during a broadcast
+BROADCAST_CHUNK = 50
+# Clients with more unsent bytes than this get broadcasts through their queue
+DIRECT_SEND_LIMIT = 64 * 1024
+
+def _dumps(obj) -> str:
+    """Serialize a message with orjson for sending as a JSON text frame."""
+    return orjson.dumps(obj).decode()
+
+# Pre-serialized error messages for the fixed error texts, so repeated
+# failures (e.g. a misbehaving client) don't re-encode them every time
+_ERROR_MESSAGES: Dict[str, str] = {
+    text: _dumps({'type': 'error', 'message': text})
+    for text in (
+        "Game is full",
+        "Invalid JSON message",
+        "Internal server error",
+        "Error processing move",
+        "Invalid coordinates. Use 0-2 for row and column",
+        "Cell is already occupied",
+        *(error.format(turn=player.value) for error in GameState.MOVE_ERRORS[1:] for player in Player),
+    )
+}
+
+class ClientState(NamedTuple):
+    """A connected client's player id and its outgoing message pipeline."""
+    player_id: str
+    queue: asyncio.Queue  # Serialized messages waiting to be sent
+    writer_task: asyncio.Task  # Drains queue into the websocket
+
 class TicTacToeServer:
-    def __init__(self, server_id: str, port: int, force_reset: bool = False):
+    def __init__(self, server_id: str, port: int, force_reset: bool = False, solo: bool = False):
         self.server_id = server_id
         self.port = port
         self.force_reset = force_reset
-        self.clients: Dict[websockets.WebSocketServerProtocol, str] = {}  # websocket -> player_id
+        self.solo = solo  # No other servers: save state but skip pub/sub
+        # Player ids are "<server>-<process token>-<n>": unique across servers and
+        # restarts (players persist in Redis) without a UUID per connection
+        self._id_prefix = f"{server_id}-{secrets.token_hex(4)}-"
+        self._id_counter = itertools.count(1)
+        self.clients: Dict[websockets.WebSocketServerProtocol, ClientState] = {}
+        # (websocket, queue) per client for broadcasts; replaced rather than
+        # mutated on (un)registration, so iterating it across awaits is safe
+        self._broadcast_targets: List[Tuple[websockets.WebSocketServerProtocol, asyncio.Queue]] = []
+        self._sending: Set[websockets.WebSocketServerProtocol] = set()  # Writers mid-send
+        self._departed: List[str] = []  # player_ids disconnected but not yet removed
+        self._state_lock: Optional[asyncio.Lock] = None  # Serializes state changes; made on the loop
         self.game_state = GameState()
         self.redis_sync = RedisSyncManager()
+        self._update_cache: Optional[Tuple[int, str]] = None  # (game state version, update message)
+        # Wire-format update message, refreshed in place when the state changes
+        # ('players' is spliced in from _players_cache when serializing)
+        self._update_msg = {'type': 'update', 'board': None, 'nextTurn': None, 'status': None,
+                            'winner': None, 'playerCount': 0}
+        self._players_cache: Optional[Tuple[dict, str]] = None  # (players copy, serialized players)
+        # Client message type -> handler(websocket, player_id, data)
+        self._message_handlers = {
+            'join': self.handle_join,
+            'move': self.handle_move,
+            'reset': self.handle_reset
+        }
+    
+    async def setup_redis(self):
+        """Connect to Redis, subscribe to sync channels and load the game state."""
+        await self.redis_sync.connect()
+        self._state_lock = asyncio.Lock()
         
-        # Subscribe to Redis channels
-        self.redis_sync.subscribe_to_channel(CHANNELS['GAME_SYNC'], self.handle_game_sync)
-        self.redis_sync.subscribe_to_channel(CHANNELS['PLAYER_JOIN'], self.handle_player_join_sync)
-        self.redis_sync.subscribe_to_channel(CHANNELS['PLAYER_LEAVE'], self.handle_player_leave_sync)
-        self.redis_sync.subscribe_to_channel(CHANNELS['GAME_MOVE'], self.handle_game_move_sync)
-        self.redis_sync.subscribe_to_channel(CHANNELS['GAME_RESET'], self.handle_game_reset_sync)
-        
-        # Start Redis listener
-        self.redis_sync.start_listening()
+        if not self.solo:
+            # Subscribe to Redis channels; every one is handled the same way
+            for channel in CHANNELS.values():
+                await self.redis_sync.subscribe_to_channel(channel, self.handle_sync)
+            self.redis_sync.resync_handler = self.resync
+            
+            # Start Redis listener
+            self.redis_sync.start_listening()
         
         # Load or reset game state
-        self.load_game_state()
+        await self.load_game_state()
     
-    def load_game_state(self):
+    async def load_game_state(self):
         """Load game state from Redis on server startup or reset if forced."""
         if self.force_reset:
             logger.info("Forcing game state reset")
             self.game_state.reset()
-            self.save_game_state()
+            await self.save_game_state()
             return
 
-        saved_state = self.redis_sync.get_game_state()
+        saved_state = await self.redis_sync.get_game_state()
         if saved_state:
             self.game_state.load_state(saved_state)
             logger.info(f"Loaded game state from Redis: {saved_state}")
         else:
             logger.info("No saved game state found, starting fresh")
             self.game_state.reset()
-            self.save_game_state()
+            await self.save_game_state()
     
-    def save_game_state(self):
+    async def save_game_state(self):
         """Save current game state to Redis."""
-        state_dict = self.game_state.get_state_dict()
-        self.redis_sync.set_game_state(state_dict)
+        await self.redis_sync.set_game_state(self.game_state.get_state_payload())
+    
+    def queue_save(self):
+        """Queue saving the current game state in solo mode.
+        
+        With no other servers there is no write to contend with or publish
+        to, so the save happens in the background, keeping Redis latency off
+        the client's critical path; it still lets the state survive a restart.
+        """
+        self.redis_sync.queue_save_and_publish(self.game_state.get_state_payload(), None, None)
     # 
     async def register_client(self, websocket):
         """Register a new client connection."""
-        player_id = str(uuid.uuid4())
-        self.clients[websocket] = player_id
+        player_id = f"{self._id_prefix}{next(self._id_counter)}"
+        queue = asyncio.Queue(maxsize=256)
+        task = asyncio.create_task(self._writer(websocket, queue))
+        self.clients[websocket] = ClientState(player_id, queue, task)
+        self._broadcast_targets = self._broadcast_targets + [(websocket, queue)]
         logger.info(f"Client {player_id} connected to server {self.server_id}")
         
         # Send current game state to new client
@@ -72,59 +141,150 @@ class TicTacToeServer:
         
         return player_id
     
+    async def _writer(self, websocket, queue: asyncio.Queue):
+        """Drain a client's outgoing queue, sending every ready message per wake-up."""
+        # Bind per-message lookups to locals once for the hot loop
+        get, get_nowait, send = queue.get, queue.get_nowait, websocket.send
+        QueueEmpty = asyncio.QueueEmpty
+        sending = self._sending
+        try:
+            while True:
+                batch = [await get()]
+                while True:
+                    try:
+                        batch.append(get_nowait())
+                    except QueueEmpty:
+                        break
+                
+                # Broadcasts must queue behind this batch to keep message order
+                sending.add(websocket)
+                if len(batch) == 1:
+                    await send(batch[0])
+                else:
+                    for message_str in batch:
+                        await send(message_str)
+                sending.discard(websocket)
+        except websockets.exceptions.ConnectionClosed:
+            # client_handler unregisters the client once its read loop ends
+            pass
+        finally:
+            sending.discard(websocket)
+    
+    def send_raw(self, websocket, message_str: str):
+        """Queue an already serialized message for a single client."""
+        client = self.clients.get(websocket)
+        if client is None:
+            return
+        try:
+            client.queue.put_nowait(message_str)
+        except asyncio.QueueFull:
+            self._close_slow_client(websocket)
+    
+    def _close_slow_client(self, websocket):
+        """Close a client whose outgoing queue has filled up."""
+        client = self.clients.get(websocket)
+        if client is not None:
+            logger.warning(f"Outgoing queue full for client {client.player_id}, closing connection")
+        asyncio.create_task(websocket.close(code=1013, reason="Too slow"))
+    
     async def unregister_client(self, websocket):
-        """Unregister a client connection."""
-        if websocket in self.clients:
-            player_id = self.clients[websocket]
-            del self.clients[websocket]
-            
-            # Remove player from game
-            self.game_state.remove_player(player_id)
-            self.save_game_state()
-            
-            # Notify other servers
-            self.redis_sync.publish_message(CHANNELS['PLAYER_LEAVE'], {
+        """Unregister a client connection.
+        
+        Disconnects arriving together (e.g. a network flap) are synced as one
+        batch: the first one yields once so the rest can be removed, then a
+        single save, publish and broadcast covers all of them.
+        """
+        if not self._remove_client(websocket):
+            return
+        if len(self._departed) > 1:
+            return  # The pending sync of an earlier disconnect covers this one
+        
+        await asyncio.sleep(0)
+        await self._post_unregister_sync()
+    
+    def _remove_client(self, websocket) -> bool:
+        """Drop a client and its player from the local state, without syncing."""
+        if websocket not in self.clients:
+            return False
+        
+        player_id, _, writer_task = self.clients.pop(websocket)
+        writer_task.cancel()
+        self._broadcast_targets = [target for target in self._broadcast_targets if target[0] is not websocket]
+        
+        self._departed.append(player_id)
+        logger.info(f"Client {player_id} disconnected from server {self.server_id}")
+        return True
+    
+    async def _post_unregister_sync(self):
+        """Remove all pending disconnects' players in one state change, then broadcast it."""
+        player_ids, self._departed = self._departed, []
+        
+        def leave():
+            players = self.game_state.players
+            removed = [player_id for player_id in player_ids if player_id in players]
+            if not removed:
+                return None
+            for player_id in removed:
+                self.game_state.remove_player(player_id)
+            return {
                 'server_id': self.server_id,
-                'player_id': player_id
-            })
-            
-            # Broadcast game state update
-            await self.broadcast_game_state()
-            
-            logger.info(f"Client {player_id} disconnected from server {self.server_id}")
+                'player_ids': removed
+            }
+        
+        try:
+            if not await self.commit_change(leave, CHANNELS['PLAYER_LEAVE']):
+                return
+        except Exception as e:
+            logger.error(f"Failed to remove players {player_ids}: {e}")
+            return
+        
+        # Broadcast game state update
+        await self.broadcast_game_state()
     
     async def handle_message(self, websocket, message):
         """Handle incoming WebSocket message from client."""
         try:
-            data = json.loads(message)
-            message_type = data.get('type')
-            player_id = self.clients[websocket]
-
-            print (f"🔄 Received message from {player_id}: {data}")
+            data = orjson.loads(message)
+            player_id = self.clients[websocket].player_id
+            logger.debug("Received message from %s: %s", player_id, data)
             
-            if message_type == 'join':
-                await self.handle_join(websocket, player_id, data)
-            elif message_type == 'move':
-                await self.handle_move(websocket, player_id, data)
-            elif message_type == 'reset':
-                await self.handle_reset(websocket, player_id)
-            else:
-                await self.send_error(websocket, f"Unknown message type: {message_type}")
+            # Clients may batch several messages into one frame as a JSON array
+            dispatch = self.dispatch_message
+            for item in (data if isinstance(data, list) else (data,)):
+                await dispatch(websocket, player_id, item)
                 
-        except json.JSONDecodeError:
+        except orjson.JSONDecodeError:
             await self.send_error(websocket, "Invalid JSON message")
         except Exception as e:
             logger.error(f"Error handling message: {e}")
             await self.send_error(websocket, "Internal server error")
     
+    async def dispatch_message(self, websocket, player_id, data):
+        """Route a single decoded client message to its handler."""
+        message_type = data.get('type')
+        
+        handler = self._message_handlers.get(message_type)
+        if handler is None:
+            await self.send_error(websocket, f"Unknown message type: {message_type}")
+            return
+        await handler(websocket, player_id, data)
+    
     async def handle_join(self, websocket, player_id, data):
         """Handle player join request."""
-        # First load latest state from Redis to ensure we have current player count
-        saved_state = self.redis_sync.get_game_state()
-        if saved_state:
-            self.game_state.load_state(saved_state)
-    
-        assigned_player = self.game_state.add_player(player_id)
+        assigned_player = None
+        
+        def join():
+            nonlocal assigned_player
+            assigned_player = self.game_state.add_player(player_id)
+            if assigned_player is None:
+                return None
+            return {
+                'server_id': self.server_id,
+                'player_id': player_id,
+                'player_symbol': assigned_player
+            }
+        
+        await self.commit_change(join, CHANNELS['PLAYER_JOIN'])
         
         if assigned_player is None:
             # Game is full, send error
@@ -132,19 +292,10 @@ class TicTacToeServer:
             await self.send_error(websocket, "Game is full")
             return
         
-        # Save state and notify other servers
-        self.save_game_state()
-        self.redis_sync.publish_message(CHANNELS['PLAYER_JOIN'], {
-            'server_id': self.server_id,
-            'player_id': player_id,
-            'player_symbol': assigned_player.value,
-            'game_state': self.game_state.get_state_dict()  # Include full game state
-        })
-        
         # Send join confirmation
-        await websocket.send(json.dumps({
+        self.send_raw(websocket, _dumps({
             'type': 'joined',
-            'playerId': assigned_player.value,
+            'playerId': assigned_player,
             'message': f'You are player {assigned_player.value}'
         }))
         
@@ -153,27 +304,81 @@ class TicTacToeServer:
         
         logger.info(f"Player {player_id} joined as {assigned_player.value}")
     
+    async def commit_change(self, change, channel: str) -> bool:
+        """Apply a change to the game state, save it and publish it to the other servers.
+        
+        change() modifies self.game_state and returns the message to publish,
+        or None to leave the state as it is. Returns whether it was applied.
+        """
+        if self.solo:
+            message = change()
+            if message is not None:
+                self.queue_save()
+            return message is not None
+        
+        # Changes from this server go through one at a time, so the local
+        # state matches Redis whenever one starts and is never rolled back
+        # over a change of our own that has not been written yet
+        async with self._state_lock:
+            version = self.game_state.version
+            committed = await self._update_shared_state(change, channel)
+        if not committed and self.game_state.version != version:
+            # The stored state was newer than ours; let local clients see it
+            await self.broadcast_game_state()
+        return committed
+    
+    async def _update_shared_state(self, change, channel: str) -> bool:
+        """Apply a change on top of the state stored in Redis, saving and publishing it atomically.
+        
+        Every write to the shared state goes through here: a compare-and-set
+        against the stored state, redone whenever another server writes it in
+        between. If the write fails, the local state is put back to what Redis
+        holds before the error is re-raised.
+        """
+        base = None
+        
+        def update(stored_state):
+            nonlocal base
+            if stored_state and stored_state != self.game_state.get_state_dict():
+                self.game_state.load_state(stored_state)
+            base = self.game_state.get_state_dict()
+            message = change()
+            if message is None:
+                return None
+            return self.game_state.get_state_payload(), message
+        
+        try:
+            return await self.redis_sync.cas_save_and_publish(update, channel) is not None
+        except Exception:
+            if base is not None:
+                self.game_state.load_state(base)
+            raise
+    
     async def handle_move(self, websocket, player_id, data):
         """Handle a move from a client."""
         try:
             row = data.get('row')
             col = data.get('col')
+            result = (False, "Error processing move")
             
-            success, message = self.game_state.make_move(player_id, row, col)
-            
-            if success:
-                # Save state to Redis
-                self.save_game_state()
-                
-                # Notify other servers about the move
-                self.redis_sync.publish_message(CHANNELS['GAME_MOVE'], {
+            def move():
+                nonlocal result
+                result = self.game_state.make_move(player_id, row, col)
+                if not result[0]:
+                    return None
+                return {
                     'server_id': self.server_id,
                     'player_id': player_id,
                     'row': row,
-                    'col': col,
-                    'game_state': self.game_state.get_state_dict()
-                })
-                
+                    'col': col
+                }
+            
+            # Moves are validated against the stored state, so a move racing
+            # with a reset or leave on another server cannot overwrite it
+            await self.commit_change(move, CHANNELS['GAME_MOVE'])
+            success, message = result
+            
+            if success:
                 # Broadcast updated state to ALL clients
                 await self.broadcast_game_state()
                 
@@ -185,124 +390,151 @@ class TicTacToeServer:
             logger.error(f"Error processing move: {e}")
             await self.send_error(websocket, "Error processing move")
     
-    async def handle_reset(self, websocket, player_id):
-        print (f"🔄 Player {player_id} requested game reset")
-
+    async def handle_reset(self, websocket, player_id, data):
         """Handle game reset request."""
-        self.game_state.reset()
-        self.save_game_state()
+        logger.debug("Player %s requested game reset", player_id)
         
-        # Notify other servers
-        self.redis_sync.publish_message(CHANNELS['GAME_RESET'], {
-            'server_id': self.server_id,
-            'player_id': player_id
-        })
+        def reset():
+            self.game_state.reset()
+            return {
+                'server_id': self.server_id,
+                'player_id': player_id
+            }
         
+        await self.commit_change(reset, CHANNELS['GAME_RESET'])
         await self.broadcast_game_state()
         logger.info(f"Game reset by player {player_id}")
     
+    def get_update_message(self) -> str:
+        """Get the serialized 'update' message for the current state.
+        
+        The message is rebuilt only when the game state version changes, so
+        repeated broadcasts and new-client updates reuse the same string.
+        """
+        version = self.game_state.version
+        if self._update_cache is None or self._update_cache[0] != version:
+            self._refresh_update_msg()
+            # Include full players info as the last field
+            message_str = f'{_dumps(self._update_msg)[:-1]},"players":{self._players_fragment()}}}'
+            self._update_cache = (version, message_str)
+        return self._update_cache[1]
+    
+    def _players_fragment(self) -> str:
+        """Get the serialized players mapping, re-encoded only after a join or leave."""
+        players = self.game_state.players
+        if self._players_cache is None or self._players_cache[0] != players:
+            self._players_cache = (dict(players), _dumps(players))
+        return self._players_cache[1]
+    
+    def _refresh_update_msg(self):
+        """Copy the current game state into the wire-format update message."""
+        game_state = self.game_state
+        message = self._update_msg
+        message['board'] = game_state.board
+        message['nextTurn'] = game_state.current_turn
+        message['status'] = game_state.status
+        message['winner'] = game_state.winner  # Game result rides on the same frame
+        message['playerCount'] = game_state.player_count
+    
     async def send_game_update(self, websocket):
         """Send current game state to a specific client."""
-        state_dict = self.game_state.get_state_dict()
-        message = {
-            'type': 'update',
-            'board': state_dict['board'],
-            'nextTurn': state_dict['current_turn'],
-            'status': state_dict['status'],
-            'playerCount': state_dict['player_count']
-        }
-        await websocket.send(json.dumps(message))
+        self.send_raw(websocket, self.get_update_message())
     
     async def broadcast_game_state(self):
         """Broadcast current game state to all connected clients."""
-        state_dict = self.game_state.get_state_dict()
-        logger.info(f"Broadcasting game state: {state_dict}")
-        
-        message = {
-            'type': 'update',
-            'board': state_dict['board'],
-            'nextTurn': state_dict['current_turn'],
-            'status': state_dict['status'],
-            'playerCount': state_dict['player_count'],
-            'players': state_dict['players']  # Include full players info
-        }
+        message_str = self.get_update_message()
+        logger.info(f"Broadcasting game state: {message_str}")
         
-        await self.broadcast_message(message)
+        await self.broadcast_raw(message_str)
         logger.info("Game state broadcast complete")
     
     async def broadcast_message(self, message):
         """Broadcast a message to all connected clients."""
-        if not self.clients:
+        await self.broadcast_raw(_dumps(message))
+    
+    async def broadcast_raw(self, message_str: str):
+        """Broadcast an already serialized message to all connected clients."""
+        # Closed connections are cleaned up by client_handler
+        targets = self._broadcast_targets
+        if len(targets) <= BROADCAST_CHUNK:
+            self._fan_out(targets, message_str)
             return
         
-        message_str = json.dumps(message)
-        disconnected_clients = []
+        # Large fan-outs yield between chunks so incoming frames are still serviced
+        for i in range(0, len(targets), BROADCAST_CHUNK):
+            self._fan_out(targets[i:i + BROADCAST_CHUNK], message_str)
+            await asyncio.sleep(0)
+    
+    def _fan_out(self, targets, message_str: str):
+        """Write a message straight to idle clients and queue it for the rest.
         
-        for websocket in self.clients:
+        A client is idle when its writer has nothing queued or in flight and its
+        socket buffer is draining; websockets.broadcast() then writes the frame
+        synchronously without waking the writer task. Everyone else goes
+        through their queue, which keeps message order and backpressure.
+        """
+        sending = self._sending
+        QueueFull = asyncio.QueueFull
+        idle = []
+        for websocket, queue in targets:
+            if (queue.empty() and websocket not in sending
+                    and websocket.transport.get_write_buffer_size() < DIRECT_SEND_LIMIT):
+                idle.append(websocket)
+                continue
             try:
-                await websocket.send(message_str)
-            except websockets.exceptions.ConnectionClosed:
-                disconnected_clients.append(websocket)
+                queue.put_nowait(message_str)
+            except QueueFull:
+                self._close_slow_client(websocket)
         
-        # Clean up disconnected clients
-        for websocket in disconnected_clients:
-            await self.unregister_client(websocket)
+        if idle:
+            websockets.broadcast(idle, message_str)
     
     async def send_error(self, websocket, error_message):
         """Send error message to client."""
-        message = {
-            'type': 'error',
-            'message': error_message
-        }
-        try:
-            await websocket.send(json.dumps(message))
-        except websockets.exceptions.ConnectionClosed:
-            pass
+        message_str = _ERROR_MESSAGES.get(error_message)
+        if message_str is None:
+            message_str = _dumps({
+                'type': 'error',
+                'message': error_message
+            })
+        self.send_raw(websocket, message_str)
     
     # Redis synchronization handlers
-    def handle_game_sync(self, data):
-        """Handle game state synchronization from other servers."""
-        if data.get('server_id') != self.server_id:
-            # Update from another server
-            self.load_game_state()
-            asyncio.create_task(self.broadcast_game_state())
-    
-    def handle_player_join_sync(self, data):
-        """Handle player join sync from other servers."""
-        if data.get('server_id') != self.server_id:
-            # Get the full game state from the message
-            if 'game_state' in data:
-                self.game_state.load_state(data['game_state'])
-            else:
-                # Fallback to loading from Redis
-                self.load_game_state()
+    async def apply_sync_state(self, data) -> bool:
+        """Apply the game state carried by a sync message.
         
-            # Ensure we broadcast the update to our clients 
-            asyncio.create_task(self.broadcast_game_state())
-    
-    def handle_player_leave_sync(self, data):
-        """Handle player leave sync from other servers."""
-        if data.get('server_id') != self.server_id:
-            self.load_game_state()
-            asyncio.create_task(self.broadcast_game_state())
+        Every publish includes the full state, so Redis is only read for
+        messages that arrive without one. Returns whether the local state
+        changed; an identical state is not reloaded, which keeps the cached
+        payload and update message valid.
+        """
+        game_state = data.get('game_state')
+        if game_state is None:
+            # Fallback to loading from Redis
+            game_state = await self.redis_sync.get_game_state()
+        if not game_state or game_state == self.game_state.get_state_dict():
+            return False
+        self.game_state.load_state(game_state)
+        return True
     
-    def handle_game_move_sync(self, data):
-        """Handle game move sync from other servers."""
+    async def handle_sync(self, data):
+        """Handle a sync message from another server on any sync channel.
+        
+        Every sync message carries the full game state, so joins, leaves,
+        moves and resets all reduce to applying it and updating local clients.
+        """
         if data.get('server_id') != self.server_id:
-            logger.info(f"Received move sync from server {data.get('server_id')}")
-            
             # Update game state from the received state
-            if 'game_state' in data:
-                self.game_state.load_state(data['game_state'])
+            if await self.apply_sync_state(data):
                 # Ensure local clients are updated
-                asyncio.create_task(self.broadcast_game_state())
-                logger.info("Game state updated from move sync")
+                await self.broadcast_game_state()
+                logger.info(f"Game state updated from server {data.get('server_id')}")
     
-    def handle_game_reset_sync(self, data):
-        """Handle game reset sync from other servers."""
-        if data.get('server_id') != self.server_id:
-            self.load_game_state()
-            asyncio.create_task(self.broadcast_game_state())
+    async def resync(self):
+        """Reload the game state from Redis after sync messages may have been missed."""
+        if await self.apply_sync_state({}):
+            await self.broadcast_game_state()
+            logger.info("Game state resynced from Redis")
     
     async def client_handler(self, websocket, path):
         """Handle new WebSocket client connections."""
@@ -316,27 +548,40 @@ class TicTacToeServer:
         finally:
             await self.unregister_client(websocket)
     
+    async def serve(self):
+        """Set up Redis and serve WebSocket clients until cancelled."""
+        await self.setup_redis()
+        try:
+            async with websockets.serve(
+                self.client_handler,
+                "localhost",
+                self.port,
+                ping_interval=20,
+                ping_timeout=10,
+                # Messages are small and broadcast verbatim; per-client deflate only burns CPU
+                compression=None
+            ):
+                logger.info(f"Server {self.server_id} running on ws://localhost:{self.port}")
+                await asyncio.Future()  # Run forever
+        finally:
+            await self.redis_sync.stop_writer()
+            await self.redis_sync.stop_listening()
+    
     def start_server(self):
         """Start the WebSocket server."""
         logger.info(f"Starting Tic-Tac-Toe server {self.server_id} on port {self.port}")
         
-        start_server = websockets.serve(
-            self.client_handler,
-            "localhost",
-            self.port,
-            ping_interval=20,
-            ping_timeout=10
-        )
-        
-        asyncio.get_event_loop().run_until_complete(start_server)
-        logger.info(f"Server {self.server_id} running on ws://localhost:{self.port}")
+        # uvloop is optional; fall back to the default asyncio loop without it
+        try:
+            import uvloop
+            uvloop.install()
+        except ImportError:
+            pass
         
         try:
-            asyncio.get_event_loop().run_forever()
+            asyncio.run(self.serve())
         except KeyboardInterrupt:
             logger.info(f"Server {self.server_id} shutting down...")
-        finally:
-            self.redis_sync.stop_listening()
 
 def main():
     parser = argparse.ArgumentParser(description='Tic-Tac-Toe WebSocket Server')
@@ -344,10 +589,12 @@ def main():
     parser.add_argument('--port', type=int, required=True, help='Server port')
     parser.add_argument('--force-reset', action='store_true', 
                        help='Force reset the game state on startup')
+    parser.add_argument('--solo', action='store_true',
+                       help='Run as the only server: save state to Redis but skip pub/sub sync')
     
     args = parser.parse_args()
     
-    server = TicTacToeServer(args.server_id, args.port, args.force_reset)
+    server = TicTacToeServer(args.server_id, args.port, args.force_reset, args.solo)
     server.start_server()
 
 if __name__ == "__main__":